@@ -0,0 +1,62 @@
+"""
+Static assets of the listing page (CSS / JS in ./static), loaded once at
+startup and served under content-hashed names, e.g.
+
+    static/listing.css  ->  /static/listing.3f9a1c0b7d.css
+
+Since the URL changes whenever the content does, responses can be cached
+forever (Cache-Control: immutable). Bodies are gzip-compressed in advance.
+"""
+
+import gzip, hashlib, os
+
+URL_PREFIX = "/static/"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js":  "text/javascript; charset=utf-8",
+}
+
+
+class Asset:
+    __slots__ = ("name", "url", "etag", "content_type", "body", "gzipped")
+
+    def __init__(self, name: str, data: bytes):
+        stem, ext = os.path.splitext(name)
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        self.name = f"{stem}.{digest}{ext}"
+        self.url = URL_PREFIX + self.name
+        self.etag = f'"{digest}"'
+        self.content_type = CONTENT_TYPES.get(ext, "application/octet-stream")
+        self.body = data
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        self.gzipped = gz if len(gz) < len(data) else None
+
+
+_by_source = {}    # {"listing.css": Asset}
+_by_name = {}      # {"listing.3f9a1c0b7d.css": Asset}
+
+
+def load(static_dir: str):
+    """Read, hash and precompress every asset in `static_dir`."""
+    _by_source.clear()
+    _by_name.clear()
+    for name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            asset = Asset(name, f.read())
+        _by_source[name] = asset
+        _by_name[asset.name] = asset
+
+
+def url(source_name: str) -> str:
+    """Versioned URL of a source file, e.g. url("listing.css")."""
+    return _by_source[source_name].url
+
+
+def get(hashed_name: str):
+    """The Asset served as /static/<hashed_name>, or None."""
+    return _by_name.get(hashed_name)
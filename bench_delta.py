@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the delta sync: bytes transferred (signature + delta) versus
+a full re-upload, for a few typical edits of a large file. Runs locally,
+without the server, using the same functions the server and client use.
+
+    python bench_delta.py [--size-mb 256]
+"""
+
+import argparse, io, os, random, tempfile, time
+
+import delta
+from utils import format_size
+
+
+def scenarios(base: bytes, rnd: random.Random):
+    size = len(base)
+
+    def overwrite(count, length):
+        new = bytearray(base)
+        for _ in range(count):
+            p = rnd.randrange(0, size - length)
+            new[p:p + length] = os.urandom(length)
+        return bytes(new)
+
+    yield "identico", base
+    yield "4 × 256 KiB sovrascritti (VM image)", overwrite(4, 256 * 1024)
+    yield "2 MiB sovrascritti in un punto", overwrite(1, 2 * 1024 * 1024)
+    yield "8 MiB aggiunti in coda (archivio)", base + os.urandom(8 * 1024 * 1024)
+    p = size // 2
+    yield "4 KiB inseriti a metà (shift)", base[:p] + os.urandom(4096) + base[p:]
+    yield "3 MiB + 123 B inseriti a metà", base[:p] + os.urandom(3 * 1024 * 1024 + 123) + base[p:]
+    yield "file riscritto interamente", os.urandom(size)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size-mb", type=int, default=64, help="dimensione del file di base (MiB)")
+    args = ap.parse_args()
+
+    rnd = random.Random(42)
+    base = os.urandom(args.size_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path = os.path.join(tmp, "base.bin")
+        new_path = os.path.join(tmp, "new.bin")
+        with open(base_path, "wb") as f:
+            f.write(base)
+
+        block_size = delta.choose_block_size(len(base))
+        t0 = time.perf_counter()
+        with open(base_path, "rb") as f:
+            signature = b"".join(delta.iter_signature(f, len(base), block_size))
+        t_sig = time.perf_counter() - t0
+
+        print(f"File di base: {format_size(len(base))}, blocchi da {format_size(block_size)}, "
+              f"signature {format_size(len(signature))} in {t_sig:.2f}s\n")
+        print(f"{'scenario':<38} {'upload completo':>16} {'delta sync':>12} {'risparmio':>10}"
+              f" {'t delta':>8} {'t apply':>8} {'delta MB/s':>11}")
+
+        for name, new in scenarios(base, rnd):
+            with open(new_path, "wb") as f:
+                f.write(new)
+
+            body = io.BytesIO()
+            t0 = time.perf_counter()
+            delta.generate_delta(signature, new_path, body)
+            t_delta = time.perf_counter() - t0
+
+            body.seek(0)
+            out = io.BytesIO()
+            t0 = time.perf_counter()
+            with open(base_path, "rb") as f:
+                delta.apply_delta(f, body.read, out, len(base))
+            t_apply = time.perf_counter() - t0
+            assert out.getvalue() == new, name
+
+            sent = len(signature) + len(body.getvalue())
+            print(f"{name:<38} {format_size(len(new)):>16} {format_size(sent):>12}"
+                  f" {100 - 100 * sent / len(new):>9.1f}% {t_delta:>7.2f}s {t_apply:>7.2f}s"
+                  f" {len(new) / t_delta / 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
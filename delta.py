@@ -0,0 +1,309 @@
+"""
+Block-level delta sync (rsync-style) used to update large files that
+already live in ROOT_DIRECTORY without re-uploading them entirely.
+
+Flow:
+1. the server splits the current file into fixed-size blocks and returns
+   a weak (Adler-32, rolling) and a strong (BLAKE2b-128) checksum per block;
+2. the client slides a rolling window over its new version, emitting
+   references to blocks the server already has and literal bytes for
+   everything else;
+3. the server rebuilds the new version from its old copy + the delta into
+   a temp file and swaps it in atomically.
+
+Wire formats (all integers big-endian):
+
+    signature:  "SPSG" | block_size:u32 | file_size:u64 | (weak:u32 strong:16B)*
+    delta:      "SPDL" | block_size:u32 | op* | "E" sha256(new file):32B
+        op "C": first_block:u64 count:u32   -> copy blocks from the old file
+        op "L": length:u32 data             -> literal bytes
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import zlib
+
+SIG_MAGIC   = b"SPSG"
+DELTA_MAGIC = b"SPDL"
+
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 1024 * 1024
+MAX_LITERAL    = 8 * 1024 * 1024   # literal piu' lunghi vengono spezzati
+COPY_CHUNK     = 1024 * 1024       # 1 MiB, come per gli upload
+
+ADLER_MOD = 65521
+
+# Dopo SPARSE_AFTER blocchi senza match (dati nuovi, es. un append) non si
+# controlla più ogni offset: si provano solo le finestre allineate, saltando
+# un blocco alla volta (adler32 in C), e ogni SPARSE_EVERY salti si fa una
+# passata completa a byte lunga un blocco, che copre tutti gli
+# allineamenti. Un blocco spostato viene così ritrovato comunque, al costo
+# di reinviare al massimo ~SPARSE_EVERY blocchi come literal.
+SPARSE_AFTER = 4
+SPARSE_EVERY = 16
+
+# File temporaneo in cui apply ricostruisce la nuova versione, accanto
+# all'originale (stesso filesystem per os.replace): ".<nome>.XXXX.delta-tmp".
+# Listing e live updates lo nascondono.
+TEMP_SUFFIX = ".delta-tmp"
+
+_SIG_HEADER   = struct.Struct(">4sIQ")
+_SIG_ENTRY    = struct.Struct(">I16s")
+_DELTA_HEADER = struct.Struct(">4sI")
+_COPY_OP      = struct.Struct(">QI")
+_LITERAL_OP   = struct.Struct(">I")
+
+
+def is_temp_name(name: str) -> bool:
+    """True for the hidden staging files written while applying a delta."""
+    return name.startswith(".") and name.endswith(TEMP_SUFFIX)
+
+
+class DeltaError(ValueError):
+    """Raised when a signature or a delta stream is malformed or does not apply."""
+
+
+def strong_checksum(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def choose_block_size(file_size: int) -> int:
+    """
+    Pick a block size close to sqrt(file_size), rounded to a power of two
+    (e.g. 64 KiB for a 4 GB file), clamped to [MIN_BLOCK_SIZE, MAX_BLOCK_SIZE].
+    """
+    if file_size <= 0:
+        return MIN_BLOCK_SIZE
+    size = 1 << max(0, math.ceil(math.log2(math.sqrt(file_size))))
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, size))
+
+
+def signature_length(file_size: int, block_size: int) -> int:
+    """Size in bytes of the signature of a file (used for Content-Length)."""
+    blocks = (file_size + block_size - 1) // block_size
+    return _SIG_HEADER.size + blocks * _SIG_ENTRY.size
+
+
+def iter_signature(f, file_size: int, block_size: int):
+    """
+    Yield the signature of the open binary file `f` in chunks, so that
+    the server can stream it without holding it all in memory.
+    """
+    yield _SIG_HEADER.pack(SIG_MAGIC, block_size, file_size)
+    out = []
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        out.append(_SIG_ENTRY.pack(zlib.adler32(block), strong_checksum(block)))
+        if len(out) >= 4096:
+            yield b"".join(out)
+            out = []
+    if out:
+        yield b"".join(out)
+
+
+def parse_signature(data: bytes):
+    """Return (block_size, file_size, [(weak, strong), ...]) from a signature."""
+    if len(data) < _SIG_HEADER.size:
+        raise DeltaError("signature troncata")
+    magic, block_size, file_size = _SIG_HEADER.unpack_from(data)
+    if magic != SIG_MAGIC or block_size <= 0:
+        raise DeltaError("signature non valida")
+    body = memoryview(data)[_SIG_HEADER.size:]
+    if len(body) % _SIG_ENTRY.size:
+        raise DeltaError("signature troncata")
+    blocks = list(_SIG_ENTRY.iter_unpack(body))
+    if len(blocks) != (file_size + block_size - 1) // block_size:
+        raise DeltaError("numero di blocchi incoerente con la dimensione")
+    return block_size, file_size, blocks
+
+
+###############################################################################
+# CLIENT: generazione del delta
+###############################################################################
+
+class _DeltaWriter:
+    """Accumulates ops, merging runs of consecutive block references."""
+
+    def __init__(self, out, block_size: int):
+        self.out = out
+        self.copy_start = None
+        self.copy_count = 0
+        self.copied = 0
+        self.literal = 0
+        out.write(_DELTA_HEADER.pack(DELTA_MAGIC, block_size))
+
+    def copy(self, index: int):
+        if self.copy_start is not None and self.copy_start + self.copy_count == index:
+            self.copy_count += 1
+            return
+        self.flush_copy()
+        self.copy_start, self.copy_count = index, 1
+
+    def flush_copy(self):
+        if self.copy_start is not None:
+            self.out.write(b"C" + _COPY_OP.pack(self.copy_start, self.copy_count))
+            self.copied += self.copy_count
+            self.copy_start, self.copy_count = None, 0
+
+    def literal_bytes(self, data):
+        if not data:
+            return
+        self.flush_copy()
+        for i in range(0, len(data), MAX_LITERAL):
+            piece = data[i:i + MAX_LITERAL]
+            self.out.write(b"L" + _LITERAL_OP.pack(len(piece)))
+            self.out.write(piece)
+            self.literal += len(piece)
+
+    def finish(self, digest: bytes):
+        self.flush_copy()
+        self.out.write(b"E" + digest)
+
+
+def generate_delta(signature: bytes, new_path: str, out) -> dict:
+    """
+    Write to `out` the delta that turns the file described by `signature`
+    into `new_path`. Returns a small dict of statistics.
+    """
+    block_size, base_size, blocks = parse_signature(signature)
+
+    # weak -> {strong: index}; il primo indice vince in caso di blocchi uguali
+    table = {}
+    for index, (weak, strong) in enumerate(blocks):
+        table.setdefault(weak, {}).setdefault(strong, index)
+
+    with open(new_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            writer = _DeltaWriter(out, block_size)
+            n = block_size
+            pos = lit_start = match_end = 0
+            fresh = True
+            a = b = 0
+            skipped = rolling_left = 0
+
+            while pos + n <= size:
+                if fresh:
+                    weak = zlib.adler32(data[pos:pos + n])
+                    a, b = weak & 0xFFFF, weak >> 16
+                    fresh = False
+                else:
+                    weak = (b << 16) | a
+
+                candidates = table.get(weak)
+                if candidates:
+                    index = candidates.get(strong_checksum(data[pos:pos + n]))
+                    if index is not None:
+                        writer.literal_bytes(data[lit_start:pos])
+                        writer.copy(index)
+                        pos += n
+                        lit_start = match_end = pos
+                        fresh = True
+                        skipped = rolling_left = 0
+                        continue
+
+                # literal lunghi: scrivili subito invece di tenerli tutti in memoria
+                if pos - lit_start >= MAX_LITERAL:
+                    writer.literal_bytes(data[lit_start:pos])
+                    lit_start = pos
+
+                # nessun match da molto: modalità rada (vedi SPARSE_AFTER)
+                if not rolling_left and pos - match_end >= SPARSE_AFTER * n:
+                    skipped += 1
+                    if skipped < SPARSE_EVERY:
+                        pos += n
+                        fresh = True
+                        continue
+                    skipped = 0
+                    rolling_left = n
+                if rolling_left:
+                    rolling_left -= 1
+
+                # fai scorrere la finestra di un byte
+                if pos + n < size:
+                    out_b, in_b = data[pos], data[pos + n]
+                    a = (a - out_b + in_b) % ADLER_MOD
+                    b = (b - n * out_b + a - 1) % ADLER_MOD
+                pos += 1
+
+            # coda piu' corta di un blocco: puo' coincidere solo con l'ultimo
+            # blocco del vecchio file, se anche quello e' corto
+            tail_start = lit_start
+            last_len = base_size - (len(blocks) - 1) * n
+            if blocks and last_len < n and size - last_len >= lit_start:
+                last = data[size - last_len:size]
+                if zlib.adler32(last) == blocks[-1][0] and strong_checksum(last) == blocks[-1][1]:
+                    writer.literal_bytes(data[lit_start:size - last_len])
+                    writer.copy(len(blocks) - 1)
+                    tail_start = size
+            writer.literal_bytes(data[tail_start:size])
+            writer.finish(hashlib.sha256(data).digest())
+        finally:
+            if size:
+                data.close()
+
+    return {"size": size, "block_size": block_size,
+            "copied_blocks": writer.copied, "literal_bytes": writer.literal}
+
+
+###############################################################################
+# SERVER: applicazione del delta
+###############################################################################
+
+def apply_delta(base, read, out, base_size: int) -> dict:
+    """
+    Rebuild the new file into `out` from the old file `base` and the delta
+    stream read through `read(n)`. Raises DeltaError if the stream is
+    malformed or the rebuilt file does not match the client's checksum.
+    """
+    def read_exact(n: int) -> bytes:
+        buf = read(n)
+        if len(buf) != n:
+            raise DeltaError("delta troncato")
+        return buf
+
+    magic, block_size = _DELTA_HEADER.unpack(read_exact(_DELTA_HEADER.size))
+    if magic != DELTA_MAGIC or block_size <= 0:
+        raise DeltaError("delta non valido")
+    nblocks = (base_size + block_size - 1) // block_size
+
+    digest = hashlib.sha256()
+    copied = literal = 0
+    while True:
+        op = read_exact(1)
+        if op == b"C":
+            first, count = _COPY_OP.unpack(read_exact(_COPY_OP.size))
+            if count == 0 or first + count > nblocks:
+                raise DeltaError("riferimento a blocchi inesistenti")
+            base.seek(first * block_size)
+            remaining = min(count * block_size, base_size - first * block_size)
+            while remaining:
+                chunk = base.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    raise DeltaError("file di base modificato durante l'applicazione")
+                out.write(chunk)
+                digest.update(chunk)
+                remaining -= len(chunk)
+            copied += count
+        elif op == b"L":
+            (length,) = _LITERAL_OP.unpack(read_exact(_LITERAL_OP.size))
+            while length:
+                chunk = read_exact(min(COPY_CHUNK, length))
+                out.write(chunk)
+                digest.update(chunk)
+                length -= len(chunk)
+                literal += len(chunk)
+        elif op == b"E":
+            if read_exact(32) != digest.digest():
+                raise DeltaError("checksum del file ricostruito non corrisponde")
+            break
+        else:
+            raise DeltaError(f"operazione sconosciuta {op!r}")
+
+    return {"copied_blocks": copied, "literal_bytes": literal}
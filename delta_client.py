@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reference client for the delta sync API: updates a file that already
+exists on the server by sending only the blocks that changed.
+
+    python delta_client.py http://192.168.1.10:8000/backup/archive.tar ./archive.tar
+
+Credentials default to the ones in credentials.yaml (if present next to
+this script) and can be overridden with -u / -p.
+"""
+
+import argparse, base64, json, os, sys, tempfile, time
+import urllib.error, urllib.request
+
+import delta
+from utils import format_size
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_credentials():
+    try:
+        import yaml
+        with open(os.path.join(SCRIPT_DIR, "credentials.yaml"), encoding="utf-8") as f:
+            auth = yaml.safe_load(f)["auth"]
+        return auth["username"], auth["password"]
+    except Exception:
+        return None, None
+
+
+def sync(url: str, local: str, user: str, password: str, block: int = 0) -> dict:
+    """Fetch the signature of `url`, send the delta of `local`, return the stats."""
+    token = base64.b64encode(f"{user}:{password}".encode()).decode()
+    auth = {"Authorization": f"Basic {token}"}
+
+    sig_url = url + "?delta=signature" + (f"&block={block}" if block else "")
+    with urllib.request.urlopen(urllib.request.Request(sig_url, headers=auth)) as r:
+        base = r.headers["X-Delta-Base"]
+        signature = r.read()
+
+    with tempfile.TemporaryFile() as body:
+        stats = delta.generate_delta(signature, local, body)
+        length = body.tell()
+        body.seek(0)
+        req = urllib.request.Request(url + "?delta=apply", data=body, method="POST", headers={
+            **auth,
+            "Content-Type": "application/octet-stream",
+            "Content-Length": str(length),
+            "X-Delta-Base": base,
+        })
+        with urllib.request.urlopen(req) as r:
+            result = json.loads(r.read())
+
+    result.update(signature_bytes=len(signature), delta_bytes=length, **stats)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Aggiorna un file sul server inviando solo i blocchi cambiati")
+    ap.add_argument("url", help="URL del file sul server, es. http://host:8000/dir/file.img")
+    ap.add_argument("local", help="nuova versione locale del file")
+    ap.add_argument("-u", "--user")
+    ap.add_argument("-p", "--password")
+    ap.add_argument("--block", type=int, default=0, help="dimensione blocco in byte (default: automatica)")
+    args = ap.parse_args()
+
+    user, password = default_credentials()
+    user, password = args.user or user, args.password or password
+    if not user or not password:
+        ap.error("credenziali mancanti: usa -u/-p o credentials.yaml")
+
+    t0 = time.time()
+    try:
+        res = sync(args.url, args.local, user, password, args.block)
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            print("❌ Il file non esiste sul server: usa l'upload normale")
+        else:
+            print(f"❌ Errore {e.code}: {e.reason}")
+        sys.exit(1)
+
+    sent = res["signature_bytes"] + res["delta_bytes"]
+    print(f"✅ {os.path.basename(args.local)} aggiornato ({format_size(res['size'])}) in {time.time() - t0:.1f}s")
+    print(f"   Trasferiti: {format_size(sent)} (signature {format_size(res['signature_bytes'])}"
+          f" + delta {format_size(res['delta_bytes'])}) invece di {format_size(res['size'])}"
+          f" — {100 * sent / max(res['size'], 1):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
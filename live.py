@@ -0,0 +1,192 @@
+"""
+Live directory updates over Server-Sent Events.
+
+Every watched directory has a single DirWatcher shared by all its
+subscribers (open browser tabs): one poller thread checks the directory
+mtime every POLL_INTERVAL seconds, rescans it when it changes (or every
+FULL_SCAN_INTERVAL, to catch files rewritten in place, or right away when
+an upload calls notify()), and pushes the resulting add / remove / change
+events, encoded once, to every subscriber's queue. One scan per change
+serves N watchers; the thread stops when the last subscriber leaves.
+
+Every directory state has a version (a short hash of names, sizes and
+mtimes): the listing page is stamped with it and every event batch
+carries it as the SSE id. A new subscriber whose version (the page's,
+or Last-Event-ID after a reconnection) is stale first receives a
+"snapshot" event with the whole directory; an up-to-date one gets
+nothing but the following events.
+"""
+
+import hashlib, json, os, queue, threading, time
+import delta
+from utils import get_file_icon, format_size, get_creation_time
+
+POLL_INTERVAL      = 1.0    # secondi tra due controlli dell'mtime della directory
+FULL_SCAN_INTERVAL = 10.0   # rescan completo anche senza cambi di mtime
+KEEPALIVE          = 15.0   # commento SSE per tenere viva la connessione
+MAX_PENDING        = 1000   # eventi in coda per subscriber prima di forzare un reload
+
+_watchers = {}              # {path assoluto: DirWatcher}
+_lock = threading.Lock()
+
+
+def _scan(path: str) -> dict:
+    """{nome: (is_dir, size, mtime_ns, mtime)} for the entries of `path`."""
+    snap = {}
+    with os.scandir(path) as it:
+        for e in it:
+            if delta.is_temp_name(e.name):
+                continue   # delta apply in corso
+            try:
+                is_dir = e.is_dir()
+                st = e.stat()
+            except OSError:
+                continue
+            snap[e.name] = (is_dir, 0 if is_dir else st.st_size, st.st_mtime_ns, st.st_mtime)
+    return snap
+
+
+def version(entries) -> str:
+    """Version of a directory state, from (name, is_dir, size, mtime) tuples."""
+    h = hashlib.blake2b(digest_size=8)
+    for name, is_dir, size, mtime in sorted(entries):
+        h.update(f"{name}\0{is_dir:d}\0{size}\0{mtime!r}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+def _version(snap: dict) -> str:
+    return version((name, info[0], info[1], info[3]) for name, info in snap.items())
+
+
+def _event(kind: str, data, eid: str = None) -> bytes:
+    head = f"id: {eid}\n" if eid else ""
+    return f"{head}event: {kind}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+def _entry(path: str, name: str, info: tuple) -> dict:
+    # bytes / mtime servono al client per inserire la voce secondo
+    # l'ordinamento attivo (stesse chiavi di _list_dir in server.py)
+    is_dir, size, _, mtime = info
+    if is_dir:
+        return {"name": name, "dir": True, "bytes": 0, "mtime": mtime}
+    try:
+        ctime = get_creation_time(os.path.join(path, name))
+    except OSError:
+        ctime = ""
+    return {"name": name, "dir": False, "icon": get_file_icon(name),
+            "size": format_size(size), "ctime": ctime, "bytes": size, "mtime": mtime}
+
+
+class Subscriber:
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self.queue = queue.Queue(MAX_PENDING)
+        self.overflow = False   # troppi eventi persi: il client deve ricaricare
+        self.initial = b""      # snapshot da inviare prima degli eventi in coda
+
+
+class DirWatcher:
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers = set()
+        self.wake = threading.Event()
+        self.dir_mtime = os.stat(path).st_mtime_ns
+        self.snapshot = _scan(path)
+        # (voci già pronte per l'evento "snapshot", versione): sostituito in
+        # blocco a ogni rescan, così subscribe() lo legge in un colpo solo
+        self.state = ({name: _entry(path, name, info) for name, info in self.snapshot.items()},
+                      _version(self.snapshot))
+        self.thread = threading.Thread(target=self._run, name=f"live:{path}", daemon=True)
+
+    def _run(self):
+        last_full = time.monotonic()
+        while True:
+            woken = self.wake.wait(POLL_INTERVAL)
+            self.wake.clear()
+            with _lock:
+                if not self.subscribers:
+                    del _watchers[self.path]
+                    return
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                now = time.monotonic()
+                if woken or mtime != self.dir_mtime or now - last_full >= FULL_SCAN_INTERVAL:
+                    self.dir_mtime, last_full = mtime, now
+                    self._rescan()
+            except OSError:
+                continue   # directory rimossa o non leggibile: riprova al prossimo giro
+
+    def _rescan(self):
+        new = _scan(self.path)
+        old = self.snapshot
+        entries = dict(self.state[0])
+
+        out = []
+        for name, info in new.items():
+            prev = old.get(name)
+            if prev != info:
+                kind = "add" if prev is None else "change"
+                entries[name] = _entry(self.path, name, info)
+                out.append((kind, entries[name]))
+        for name in old.keys() - new.keys():
+            entries.pop(name, None)
+            out.append(("remove", {"name": name}))
+        if not out:
+            self.snapshot = new
+            return
+        ver = _version(new)
+        self.snapshot, self.state = new, (entries, ver)
+        # l'ultimo evento del gruppo porta la versione: è il Last-Event-ID
+        # che il browser rimanda riconnettendosi
+        last = len(out) - 1
+        self._broadcast(b"".join(_event(kind, data, ver if i == last else None)
+                                 for i, (kind, data) in enumerate(out)))
+
+    def _broadcast(self, data: bytes):
+        with _lock:
+            subs = list(self.subscribers)
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(data)
+            except queue.Full:
+                sub.overflow = True
+
+
+def subscribe(path: str, last_id: str = None) -> Subscriber:
+    """Register a new subscriber on `path`, starting its watcher if needed.
+
+    `last_id` is the version the client already shows: the snapshot is only
+    sent when it differs from the current one.
+    """
+    path = os.path.abspath(path)
+    new = None
+    while True:
+        with _lock:
+            watcher = _watchers.get(path)
+            if watcher is None and new is not None:
+                watcher = _watchers[path] = new
+            if watcher is not None:
+                sub = Subscriber(watcher)
+                watcher.subscribers.add(sub)
+                entries, ver = watcher.state
+                break
+        # scan completo (uno stat per file) fuori dal lock globale, poi si
+        # ricontrolla: nel frattempo un altro subscriber può averlo creato
+        new = DirWatcher(path)
+    if watcher is new:
+        watcher.thread.start()
+    if last_id != ver:
+        sub.initial = _event("snapshot", list(entries.values()), ver)
+    return sub
+
+
+def unsubscribe(sub: Subscriber):
+    with _lock:
+        sub.watcher.subscribers.discard(sub)
+
+
+def notify(path: str):
+    """Upload hook: rescan `path` right away if someone is watching it."""
+    watcher = _watchers.get(os.path.abspath(path))
+    if watcher is not None:
+        watcher.wake.set()
@@ -0,0 +1,180 @@
+"""
+On-demand request profiling for the server:
+- sampled per-request cProfile, dumped as .pstats files;
+- slow-request log with per-phase timings (auth, fs, render, send, ...);
+- thread dump of what every handler thread is doing.
+
+Everything is off by default and toggled at runtime from /?debug=status. While
+disabled a request only pays for a couple of dict lookups.
+"""
+
+import cProfile, io, itertools, json, os, pstats, random, sys, threading, time, traceback
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+SETTINGS = {
+    "profile_rate": 0.0,   # frazione di richieste profilate con cProfile (0 = off)
+    "slow_ms": 0,          # soglia slow-request log in ms (0 = off)
+}
+MAX_PROFILES = 200         # file .pstats conservati, i più vecchi vengono cancellati
+MAX_SLOW_LOG = 5 * 1024 * 1024   # byte: oltre, slow_requests.log passa a .1 (uno solo)
+
+DEBUG_DIR    = None        # impostata da configure()
+PROFILE_DIR  = None
+SLOW_LOG     = None
+
+RECENT_SLOW = deque(maxlen=50)   # ultime richieste lente, per la pagina di debug
+ACTIVE      = {}                 # {thread ident: (metodo, path, client, inizio)}
+
+NULL_PHASE = nullcontext()
+_profile_lock = threading.Lock()   # un solo cProfile attivo alla volta
+_log_lock = threading.Lock()
+_profile_seq = itertools.count()
+
+
+def configure(debug_dir: str, profile_rate: float = 0.0, slow_ms: float = 0):
+    """Set the output directory and the initial settings (from credentials.yaml)."""
+    global DEBUG_DIR, PROFILE_DIR, SLOW_LOG
+    DEBUG_DIR   = debug_dir
+    PROFILE_DIR = os.path.join(debug_dir, "profiles")
+    SLOW_LOG    = os.path.join(debug_dir, "slow_requests.log")
+    update(profile_rate=profile_rate, slow_ms=slow_ms)
+
+
+def update(profile_rate=None, slow_ms=None):
+    if profile_rate is not None:
+        SETTINGS["profile_rate"] = min(1.0, max(0.0, float(profile_rate)))
+    if slow_ms is not None:
+        SETTINGS["slow_ms"] = max(0.0, float(slow_ms))
+    if SETTINGS["profile_rate"]:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+    if SETTINGS["slow_ms"]:
+        os.makedirs(DEBUG_DIR, exist_ok=True)
+
+
+class PhaseTimer:
+    """Accumulates wall-clock time per named phase of a single request."""
+
+    __slots__ = ("start", "phases")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+def new_timer():
+    """A PhaseTimer if the slow-request log is on, otherwise None."""
+    return PhaseTimer() if SETTINGS["slow_ms"] else None
+
+
+def start_profile():
+    """Start a cProfile for this request if it is sampled, otherwise None."""
+    rate = SETTINGS["profile_rate"]
+    if not rate or random.random() >= rate:
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None     # un altro thread sta già profilando
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        _profile_lock.release()
+        return None
+    return prof
+
+
+def _slug(path: str) -> str:
+    slug = "".join(c if c.isalnum() or c in "-_." else "_" for c in path.split("?", 1)[0])
+    return slug.strip("_")[:60] or "root"
+
+
+def finish_profile(prof, method: str, path: str):
+    prof.disable()
+    _profile_lock.release()
+    name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{next(_profile_seq) % 10000:04d}"
+            f"-{method}-{_slug(path)}.pstats")
+    prof.dump_stats(os.path.join(PROFILE_DIR, name))
+
+    files = list_profiles()
+    for old in files[MAX_PROFILES:]:
+        try:
+            os.unlink(os.path.join(PROFILE_DIR, old))
+        except OSError:
+            pass
+
+
+def cancel_profile(prof):
+    """Stop a profile without saving it (e.g. for long-lived requests)."""
+    prof.disable()
+    _profile_lock.release()
+
+
+def list_profiles():
+    """Names of the saved .pstats files, newest first."""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".pstats")]
+    except (OSError, TypeError):
+        return []
+    return sorted(names, reverse=True)
+
+
+def profile_report(name: str, limit: int = 40) -> str:
+    """Text summary of a saved profile, sorted by cumulative time."""
+    out = io.StringIO()
+    stats = pstats.Stats(os.path.join(PROFILE_DIR, os.path.basename(name)), stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def record_request(timer, method: str, path: str, client: str, status):
+    """Append the request to the slow log if it exceeded the threshold."""
+    threshold = SETTINGS["slow_ms"]
+    total_ms = timer.elapsed() * 1000
+    if not threshold or total_ms < threshold:
+        return
+    entry = {
+        "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "method": method, "path": path, "client": client, "status": status,
+        "total_ms": round(total_ms, 1),
+        "phases": {k: round(v * 1000, 1) for k, v in timer.phases.items()},
+    }
+    RECENT_SLOW.appendleft(entry)
+    with _log_lock:
+        try:
+            if os.path.getsize(SLOW_LOG) >= MAX_SLOW_LOG:
+                os.replace(SLOW_LOG, SLOW_LOG + ".1")
+        except OSError:
+            pass
+        with open(SLOW_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    print(f"🐢 Richiesta lenta: {method} {path} {entry['total_ms']} ms {entry['phases']}")
+
+
+def thread_dump() -> str:
+    """Stack of every thread, with the request each handler thread is serving."""
+    frames = sys._current_frames()
+    now = time.time()
+    out = []
+    for t in threading.enumerate():
+        line = f"--- {t.name} (ident {t.ident}{', daemon' if t.daemon else ''})"
+        req = ACTIVE.get(t.ident)
+        if req:
+            method, path, client, since = req
+            line += f" — {method} {path} da {client}, da {now - since:.1f}s"
+        out.append(line)
+        frame = frames.get(t.ident)
+        if frame is not None:
+            out.extend(s.rstrip("\n") for s in traceback.format_stack(frame))
+        out.append("")
+    return "\n".join(out)
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import http.server, socketserver, base64, os, yaml, time
+import http.server, socketserver, base64, os, yaml, time, json, shutil, tempfile, threading, queue
 from socketserver import ThreadingMixIn
 from urllib.parse import unquote, quote, parse_qs
+from html import escape
 from utils import (find_directory, get_local_ip, generate_qr_code, get_file_icon,
                    identify_device, format_size, get_creation_time)
+import delta
+import profiling
+import live
+import assets
 
 ###############################################################################
 # CONFIGURAZIONE
@@ -41,9 +46,19 @@ ALLOWED_EXTENSIONS = {
     '.zip', '.tar', '.gz', '.rar', '.7z',
     '.py', '.js', '.json', '.xml', '.html', '.css', '.cpp', '.java', '.c', '.h'
 }
+# Delta sync: oltre alla whitelist degli upload si possono aggiornare le
+# immagini disco, il caso tipico dei file grandi modificati in pochi punti
+DELTA_EXTENSIONS = ALLOWED_EXTENSIONS | {'.img', '.iso', '.qcow2', '.vmdk', '.vdi', '.vhd', '.vhdx'}
 MAX_ATTEMPTS = 5
 ATTEMPT_WINDOW = 900  # 15 minuti in secondi
 
+# Debug: profiling campionato + slow-request log (spenti di default, si
+# attivano da /?debug=status oppure dalla sezione opzionale "debug" di credentials.yaml)
+DEBUG_CFG = cfg.get("debug") or {}
+profiling.configure(os.path.join(SCRIPT_DIR, "debug"),
+                    profile_rate=DEBUG_CFG.get("profile_rate", 0),
+                    slow_ms=DEBUG_CFG.get("slow_ms", 0))
+
 ###############################################################################
 # SERVER MULTITHREAD
 ###############################################################################
@@ -52,12 +67,99 @@ class ThreadingHTTPServer(ThreadingMixIn, socketserver.TCPServer):
     daemon_threads = True
     allow_reuse_address = True
 
+###############################################################################
+# TEMPLATE LISTING (precompilato all'avvio)
+###############################################################################
+
+# CSS e JS della pagina stanno in ./static e sono serviti con nomi versionati
+# (hash del contenuto), cache immutable e corpo già compresso con gzip
+assets.load(os.path.join(SCRIPT_DIR, "static"))
+
+# Parti fisse della pagina già codificate in bytes: per ogni richiesta si
+# uniscono solo i pezzi variabili (path, ordinamento attivo, voci)
+LISTING_HEAD = b'<html><head><meta charset="utf-8"><title>'
+LISTING_TITLE_END = (
+    f'</title><link rel="stylesheet" href="{assets.url("listing.css")}">'
+    f'<script src="{assets.url("listing.js")}" defer></script>'
+    '</head><body><a href="/set_root" class="admin-btn">⚙️ Set Root</a><h2>Directory: '
+).encode()
+LISTING_UPLOAD = (
+    '<hr><h3>Upload file</h3>'
+    '<form id="uForm"><input type="file" id="uFile" name="file" required> '
+    '<button type="submit">Upload</button></form>'
+    '<div id="box"><div class="stats"><span id="perc">0%</span><span id="speed">0 KB/s</span></div>'
+    '<div class="track"><div id="bar"></div></div></div>'
+    '<hr><div class="sort-bar"><strong>Ordina per:</strong>\n'
+).encode()
+LISTING_CONTENTS = b'</div><hr><h3>Contents</h3><ul id="listing" data-version="'
+LISTING_TAIL = b'</ul></body></html>'
+
+SORT_OPTIONS = [
+    ('name',   'asc',  '📝 Nome (A→Z)'),
+    ('name',   'desc', '📝 Nome (Z→A)'),
+    ('size',   'asc',  '📊 Dimensione (min→max)'),
+    ('size',   'desc', '📊 Dimensione (max→min)'),
+    ('format', 'asc',  '📄 Formato (A→Z)'),
+    ('format', 'desc', '📄 Formato (Z→A)'),
+    ('date',   'asc',  '📅 Data (vecchi→nuovi)'),
+    ('date',   'desc', '📅 Data (nuovi→vecchi)'),
+]
+# ((sort, dir), prefisso attivo, prefisso normale, suffisso): in mezzo va il path
+SORT_BUTTONS = [
+    ((by, d), b"<a class='sort-btn active' href='", b"<a class='sort-btn' href='",
+     f"?sort={by}&dir={d}'>{label}</a>\n".encode())
+    for by, d, label in SORT_OPTIONS
+]
+
 ###############################################################################
 # HANDLER
 ###############################################################################
 
 class AuthHandler(http.server.SimpleHTTPRequestHandler):
 
+    _timer      = None    # profiling.PhaseTimer se lo slow-request log è attivo
+    _prof       = None    # cProfile della richiesta, se campionata
+    _status     = None
+    _long_lived = False   # richieste che restano aperte non finiscono nello slow log
+
+    # ------- profiling / slow-request log ---------------------------------
+    def handle_one_request(self):
+        # timer e profilo partono in parse_request, a richiesta ricevuta: una
+        # connessione inattiva non deve tenere occupato il profiler
+        self._timer = self._prof = self._status = None
+        try:
+            super().handle_one_request()
+        finally:
+            profiling.ACTIVE.pop(threading.get_ident(), None)
+            command = getattr(self, "command", None)
+            if self._prof is not None:
+                profiling.finish_profile(self._prof, command, self.path)
+                self._prof = None
+            # le richieste rifiutate dall'auth (401 / 429) non finiscono nel log
+            if (self._timer is not None and command and not self._long_lived
+                    and self._status not in (401, 429)):
+                profiling.record_request(self._timer, command, self.path,
+                                         self.client_address[0], self._status)
+
+    def parse_request(self):
+        ok = super().parse_request()
+        if ok:
+            # il tempo di invio di request line e header del client non conta
+            self._timer = profiling.new_timer()
+            self._prof = profiling.start_profile()
+            profiling.ACTIVE[threading.get_ident()] = (
+                self.command, self.path, self.client_address[0], time.time())
+        return ok
+
+    def log_request(self, code='-', size='-'):
+        self._status = code
+        super().log_request(code, size)
+
+    def _phase(self, name: str):
+        # No-op condiviso quando lo slow-request log è spento
+        t = self._timer
+        return t.phase(name) if t is not None else profiling.NULL_PHASE
+
     # ------- helper autenticazione con rate limiting ----------------------
     def _check_rate_limit(self):
         """Controlla rate limiting per autenticazione fallita (5 tentativi / 15 min)"""
@@ -115,9 +217,18 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
 
     # ------- GET -----------------------------------------------------------
     def do_GET(self):
-        if not self._ok_auth():
+        with self._phase("auth"):
+            auth_ok = self._ok_auth()
+        if not auth_ok:
             self._auth_required(); return
 
+        # solo i nomi con hash noti: una cartella "static" resta navigabile
+        asset = None
+        if self.path.startswith(assets.URL_PREFIX):
+            asset = assets.get(self.path[len(assets.URL_PREFIX):].split('?', 1)[0])
+        if asset is not None:
+            self._send_asset(asset); return
+
         ua = self.headers.get("User-Agent", "unknown")
         print(f"📱 {self.client_address[0]} – {identify_device(ua)}")
 
@@ -157,18 +268,38 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
         sort_by = query_params.get('sort', ['name'])[0]  # 'name' or 'size'
         sort_dir = query_params.get('dir', ['asc'])[0]   # 'asc' or 'desc'
 
+        # Pagine di debug come query sulla root: nessuna cartella può oscurarle
+        if req_path == '/' and 'debug' in query_params:
+            self._debug_get(query_params); return
+
         sub  = unquote(req_path.lstrip("/")).replace("\\", "/")
         path = os.path.join(ROOT_DIRECTORY, sub)
 
-        if os.path.isdir(path):
+        if query_params.get('delta', [''])[0] == 'signature':
+            target = self._delta_target(sub)
+            if target is None:
+                return
+            if not os.path.isfile(target):
+                self.send_error(404, "Not found"); return
+            self._send_signature(target, query_params.get('block', [''])[0])
+            return
+
+        with self._phase("fs"):
+            is_dir = os.path.isdir(path)
+            is_file = not is_dir and os.path.isfile(path)
+
+        if is_dir and 'events' in query_params:
+            self._stream_events(path, query_params.get('since', [''])[0])
+        elif is_dir:
             self._show_dir(path, req_path, sort_by, sort_dir)
-        elif os.path.isfile(path):
+        elif is_file:
             # Log del download
             file_size = os.path.getsize(path)
             print(f"📥 Download: {os.path.basename(path)} ({format_size(file_size)}) da {self.client_address[0]}")
             self.path = self.path.replace("\\", "/")
             try:
-                super().do_GET()
+                with self._phase("send"):
+                    super().do_GET()
             except (BrokenPipeError, ConnectionResetError):
                 # Client ha interrotto il download (normale con file grandi su mobile)
                 pass
@@ -179,7 +310,9 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
 
     # ------- POST (upload con parser streaming) ----------------------------
     def do_POST(self):
-        if not self._ok_auth():
+        with self._phase("auth"):
+            auth_ok = self._ok_auth()
+        if not auth_ok:
             self._auth_required(); return
         
         # Controlla rate limiting anche durante upload
@@ -195,7 +328,6 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
         if self.path.rstrip('/') == '/set_root':
             length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(length).decode(errors='ignore')
-            from urllib.parse import parse_qs
             params = parse_qs(body)
             new_root = params.get('new_root', [None])[0]
             if not new_root:
@@ -225,6 +357,26 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
             except Exception as e:
                 self._err(f"Impossibile impostare la directory: {e}"); return
 
+        path_and_query = self.path.split('?', 1)
+        query_params = parse_qs(path_and_query[1]) if len(path_and_query) > 1 else {}
+        if path_and_query[0] == '/' and 'debug' in query_params:
+            self._debug_post(); return
+
+        # Delta sync: aggiorna un file esistente inviando solo i blocchi cambiati
+        if query_params.get('delta', [''])[0] == 'apply':
+            sub = unquote(path_and_query[0].lstrip("/")).replace("\\", "/")
+            target = self._delta_target(sub)
+            if target is None:
+                return
+            # solo la scrittura è limitata: la signature è in sola lettura, come il download
+            ext = os.path.splitext(target)[1].lower()
+            if ext not in DELTA_EXTENSIONS:
+                print(f"⚠️  Delta bloccato da {self.client_address[0]}: {sub} ({ext})")
+                self._err(f"🚫 Tipo file non consentito: {ext}"); return
+            with self._phase("delta"):
+                self._apply_delta(target)
+            return
+
         ctype = self.headers.get("Content-Type", "")
         if "multipart/form-data" not in ctype:
             self._err("Content-Type non supportato"); return
@@ -240,19 +392,20 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
         os.makedirs(ddir, exist_ok=True)
 
         r = self.rfile
-        # 1. scorri finché trovi la prima linea boundary
-        line = r.readline()
-        while line.strip() != boundary:
-            if not line: self._err("Bad multipart"); return
+        with self._phase("parse"):
+            # 1. scorri finché trovi la prima linea boundary
             line = r.readline()
+            while line.strip() != boundary:
+                if not line: self._err("Bad multipart"); return
+                line = r.readline()
 
-        # 2. leggi header della parte
-        headers = {}
-        while True:
-            line = r.readline()
-            if line in (b"\r\n", b"\n", b""): break
-            k, v = line.decode().split(":", 1)
-            headers[k.strip().lower()] = v.strip()
+            # 2. leggi header della parte
+            headers = {}
+            while True:
+                line = r.readline()
+                if line in (b"\r\n", b"\n", b""): break
+                k, v = line.decode().split(":", 1)
+                headers[k.strip().lower()] = v.strip()
 
         disp = headers.get("content-disposition", "")
         # es. form-data; name="file"; filename="something.iso"
@@ -277,7 +430,7 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
 
         # 3. copia dati fino al prossimo boundary
         CHUNK = 1024 * 1024   # 1 MiB
-        with open(dpath, "wb") as out:
+        with self._phase("write"), open(dpath, "wb") as out:
             prev = r.readline()
             while True:
                 curr = r.readline()
@@ -291,6 +444,7 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
         # Log dell'upload con dettagli
         file_size = os.path.getsize(dpath)
         print(f"📤 Upload: {filename} ({format_size(file_size)}) da {self.client_address[0]} → {dpath}")
+        live.notify(ddir)
 
         self.send_response(201)
         self.send_header("Content-Type", "text/html; charset=utf-8")
@@ -300,188 +454,324 @@ class AuthHandler(http.server.SimpleHTTPRequestHandler):
             f"<a href='{self.path}'>Indietro</a></body></html>"
         ).encode())
 
+    # ------- delta sync (stile rsync) ---------------------------------------
+    @staticmethod
+    def _delta_base(st) -> str:
+        # Identifica la versione del file su cui è stata calcolata la signature
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+    def _delta_target(self, sub: str):
+        """Path reale del file per il delta sync, None se rifiutato (errore già inviato)"""
+        # realpath risolve anche "..", "%2F.." e symlink: il file deve stare nella root
+        root = os.path.realpath(ROOT_DIRECTORY)
+        path = os.path.realpath(os.path.join(root, sub))
+        if os.path.commonpath([root, path]) != root or path == root:
+            print(f"⚠️  Delta bloccato da {self.client_address[0]}: {sub} fuori dalla root")
+            self.send_error(403, "Forbidden")
+            return None
+        return path
+
+    def _send_signature(self, path: str, block: str):
+        """GET <file>?delta=signature[&block=N]: checksum dei blocchi del file"""
+        try:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if block:
+                    try:
+                        block_size = int(block)
+                    except ValueError:
+                        self._err("Parametro block non valido"); return
+                    if not delta.MIN_BLOCK_SIZE <= block_size <= delta.MAX_BLOCK_SIZE:
+                        self._err(f"block deve essere tra {delta.MIN_BLOCK_SIZE} e {delta.MAX_BLOCK_SIZE}"); return
+                else:
+                    block_size = delta.choose_block_size(st.st_size)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(delta.signature_length(st.st_size, block_size)))
+                self.send_header("X-Delta-Base", self._delta_base(st))
+                self.end_headers()
+                for chunk in delta.iter_signature(f, st.st_size, block_size):
+                    self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _apply_delta(self, path: str):
+        """POST <file>?delta=apply: ricostruisce il file da vecchia copia + delta"""
+        if not os.path.isfile(path):
+            self.send_error(404, "Not found"); return
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0:
+            self._err("Content-Length mancante"); return
+
+        remaining = [length]
+        def read(n):
+            # non leggere mai oltre il body della richiesta
+            buf = self.rfile.read(min(n, remaining[0]))
+            remaining[0] -= len(buf)
+            return buf
+
+        ddir, name = os.path.split(path)
+        fd, tmp = tempfile.mkstemp(dir=ddir, prefix=f".{name}.", suffix=delta.TEMP_SUFFIX)
+        try:
+            with open(path, "rb") as base, os.fdopen(fd, "wb") as out:
+                st = os.fstat(base.fileno())
+                if self.headers.get("X-Delta-Base", "") != self._delta_base(st):
+                    self.send_error(409, "File modificato dopo la signature, riprova"); return
+                stats = delta.apply_delta(base, read, out, st.st_size)
+            # se qualcun altro ha cambiato il file nel frattempo non sovrascrivere
+            if self._delta_base(os.stat(path)) != self._delta_base(st):
+                self.send_error(409, "File modificato durante l'aggiornamento, riprova"); return
+            shutil.copymode(path, tmp)
+            os.replace(tmp, path)
+            live.notify(ddir)
+        except delta.DeltaError as e:
+            self._err(f"Delta non valido: {e}"); return
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+        file_size = os.path.getsize(path)
+        print(f"🔁 Delta: {name} ({format_size(file_size)}) da {self.client_address[0]} — "
+              f"{format_size(length)} ricevuti, {stats['copied_blocks']} blocchi riusati")
+
+        body = json.dumps({"size": file_size, "received": length, **stats}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ------- aggiornamenti live della directory (Server-Sent Events) -------
+    def _stream_events(self, local: str, since: str):
+        """GET <dir>?events=1&since=<versione>: stream text/event-stream di add/remove/change"""
+        self._long_lived = True
+        if self._prof is not None:
+            # uno stream aperto per ore non deve bloccare il profiler
+            profiling.cancel_profile(self._prof)
+            self._prof = None
+        try:
+            # riconnettendosi il browser manda l'id dell'ultimo evento ricevuto
+            sub = live.subscribe(local, self.headers.get("Last-Event-ID") or since)
+        except OSError:
+            self.send_error(404, "Not found"); return
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(b"retry: 3000\n\n" + sub.initial)
+            self.wfile.flush()
+            while not sub.overflow:
+                try:
+                    data = sub.queue.get(timeout=live.KEEPALIVE)
+                except queue.Empty:
+                    data = b": ping\n\n"
+                self.wfile.write(data)
+                self.wfile.flush()
+            # client troppo lento: meglio un reload che una lista sbagliata
+            self.wfile.write(b"event: reload\ndata: {}\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            live.unsubscribe(sub)
+
+    # ------- asset statici versionati --------------------------------------
+    def _send_asset(self, asset):
+        """GET /static/<nome>.<hash>.<ext>: cacheabile per sempre"""
+        if self.headers.get("If-None-Match") == asset.etag:
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Cache-Control", assets.CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        use_gzip = asset.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        body = asset.gzipped if use_gzip else asset.body
+        self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", assets.CACHE_CONTROL)
+        self.send_header("ETag", asset.etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
     # ------- directory listing + frontend ----------------------------------
     def _show_dir(self, local: str, req: str, sort_by: str = 'name', sort_dir: str = 'asc'):
+        with self._phase("fs"):
+            try:
+                entries = self._list_dir(local, sort_by, sort_dir)
+            except OSError:
+                entries = None
+
+        with self._phase("render"):
+            if entries is None:
+                body = f"<html><body><h2>Cannot list {req}</h2></body></html>".encode()
+            else:
+                req_b = req.encode()
+                parts = [LISTING_HEAD, req_b, LISTING_TITLE_END, req_b, b"</h2>"]
+                up = os.path.dirname(req.rstrip("/"))
+                if up:
+                    parts.append(f"<a href='{up}'>[Go&nbsp;up]</a>".encode())
+                parts.append(LISTING_UPLOAD)
+                active = (sort_by, sort_dir)
+                for key, on, off, suffix in SORT_BUTTONS:
+                    parts += (on if key == active else off, req_b, suffix)
+                # versione della lista: lo stream SSE manda lo snapshot solo se è cambiata
+                ver = live.version((item, is_dir, size, mtime)
+                                   for item, is_dir, size, _, mtime in entries)
+                parts += (LISTING_CONTENTS, ver.encode(), b'">')
+
+                items = []
+                for item, is_dir, size, ctim, mtime in entries:
+                    nxt = (req.strip("/") + "/" + item).lstrip("/")
+                    href = "/" + quote(nxt.replace("\\", "/"))
+                    name = escape(item)
+                    if is_dir:
+                        items.append(f"<li data-name=\"{name}\" data-dir=\"1\" data-size=\"0\" data-mtime=\"{mtime!r}\">📁 <a href='{href}' data-trackable>{name}</a></li>")
+                    else:
+                        icon = get_file_icon(item)
+                        items.append(f"<li data-name=\"{name}\" data-size=\"{size}\" data-mtime=\"{mtime!r}\">{icon} <a download href='{href}' data-trackable>{name}</a> "
+                                     f"<small>({format_size(size)}, {ctim})</small></li>")
+                parts.append("".join(items).encode())
+                parts.append(LISTING_TAIL)
+                body = b"".join(parts)
+
+        with self._phase("send"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def _list_dir(self, local: str, sort_by: str, sort_dir: str):
+        """Legge e ordina la directory: [(nome, is_dir, size, data creazione, mtime), ...]"""
+        # nasconde i file temporanei di un delta apply in corso
+        items = [i for i in os.listdir(local) if not delta.is_temp_name(i)]
+
+        # Sort items based on parameters
+        if sort_by == 'size':
+            # Sort by file size (with name as secondary sort), directories get size 0
+            def get_sort_key(item):
+                path = os.path.join(local, item)
+                try:
+                    size = os.path.getsize(path) if os.path.isfile(path) else 0
+                except:
+                    size = 0
+                return (size, item)
+            items = sorted(items, key=get_sort_key, reverse=(sort_dir == 'desc'))
+        elif sort_by == 'format':
+            # Sort by file extension/format
+            def get_sort_key(item):
+                path = os.path.join(local, item)
+                if os.path.isdir(path):
+                    ext = ''
+                else:
+                    ext = os.path.splitext(item)[1].lower()
+                return (ext, item)
+            items = sorted(items, key=get_sort_key, reverse=(sort_dir == 'desc'))
+        elif sort_by == 'date':
+            # Sort by modification date
+            def get_sort_key(item):
+                path = os.path.join(local, item)
+                try:
+                    mtime = os.path.getmtime(path)
+                except:
+                    mtime = 0
+                return (mtime, item)
+            items = sorted(items, key=get_sort_key, reverse=(sort_dir == 'desc'))
+        else:
+            # Sort by name (default)
+            items = sorted(items, reverse=(sort_dir == 'desc'))
+
+        entries = []
+        for item in items:
+            p = os.path.join(local, item)
+            if os.path.isdir(p):
+                entries.append((item, True, 0, "", os.path.getmtime(p)))
+            else:
+                entries.append((item, False, os.path.getsize(p), get_creation_time(p), os.path.getmtime(p)))
+        return entries
+
+    # ------- debug: profiling, slow requests, thread dump ------------------
+    def _debug_get(self, query_params: dict):
+        """/?debug=status | threads | profile&name=<file .pstats>"""
+        page = query_params['debug'][0]
+        if page == 'threads':
+            self._send_text(profiling.thread_dump()); return
+        if page == 'profile':
+            name = query_params.get('name', [''])[0]
+            if name not in profiling.list_profiles():
+                self.send_error(404, "Not found"); return
+            self._send_text(profiling.profile_report(name)); return
+        if page != 'status':
+            self.send_error(404, "Not found"); return
+
+        st = profiling.SETTINGS
+        # path & co. arrivano dal client (anche non autenticato): sempre escape
+        slow = "".join(
+            f"<tr><td>{escape(e['ts'])}</td><td>{escape(str(e['method']))} {escape(str(e['path']))}</td>"
+            f"<td>{escape(str(e['status']))}</td><td>{e['total_ms']}</td>"
+            f"<td>{escape(', '.join(f'{k} {v}' for k, v in e['phases'].items()))}</td></tr>"
+            for e in profiling.RECENT_SLOW)
+        profiles = "".join(
+            f"<li><a href='/?debug=profile&amp;name={quote(n)}'>{escape(n)}</a></li>"
+            for n in profiling.list_profiles()[:50])
+
         self.send_response(200)
         self.send_header("Content-Type", "text/html; charset=utf-8")
         self.end_headers()
-
-        up = os.path.dirname(req.rstrip("/"))
-        backlink = "" if up == "" else f"<a href='{up}'>[Go&nbsp;up]</a>"
-
-        # Build sort buttons
-        sort_buttons = f"""
-        <div style="margin: 20px 0; padding: 10px; background: #f5f5f5; border-radius: 5px;">
-            <strong>Ordina per:</strong>
-            <a href='{req}?sort=name&dir=asc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='name' and sort_dir=='asc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📝 Nome (A→Z)</a>
-            <a href='{req}?sort=name&dir=desc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='name' and sort_dir=='desc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📝 Nome (Z→A)</a>
-            <a href='{req}?sort=size&dir=asc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='size' and sort_dir=='asc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📊 Dimensione (min→max)</a>
-            <a href='{req}?sort=size&dir=desc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='size' and sort_dir=='desc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📊 Dimensione (max→min)</a>
-            <a href='{req}?sort=format&dir=asc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='format' and sort_dir=='asc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📄 Formato (A→Z)</a>
-            <a href='{req}?sort=format&dir=desc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='format' and sort_dir=='desc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📄 Formato (Z→A)</a>
-            <a href='{req}?sort=date&dir=asc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='date' and sort_dir=='asc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📅 Data (vecchi→nuovi)</a>
-            <a href='{req}?sort=date&dir=desc' style="padding: 5px 10px; margin: 0 5px; background: {'#007bff' if sort_by=='date' and sort_dir=='desc' else '#ccc'}; color: white; text-decoration: none; border-radius: 3px;">📅 Data (nuovi→vecchi)</a>
-        </div>
-        """
-
         html = f"""
-        <html><head><meta charset="utf-8"><title>{req}</title>
+        <html><head><meta charset="utf-8"><title>Debug</title>
         <style>
-            .admin-btn {{
-                position: absolute;
-                top: 20px;
-                right: 20px;
-                padding: 10px 15px;
-                background-color: #007bff;
-                color: white;
-                text-decoration: none;
-                border-radius: 5px;
-                font-family: sans-serif;
-                font-size: 14px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            .admin-btn:hover {{
-                background-color: #0056b3;
-            }}
-            body {{ font-family: sans-serif; padding: 20px; }}
-            h2 {{ margin-top: 0; }}
-            a.visited-link {{
-                color: #7030a0 !important;  /* Viola */
-            }}
+            body {{ font-family: sans-serif; padding: 20px; line-height: 1.6; }}
+            input {{ padding: 6px; border: 1px solid #ccc; border-radius: 4px; width: 100px; }}
+            button {{ padding: 8px 15px; background: #28a745; color: white; border: none; border-radius: 4px; cursor: pointer; }}
+            table {{ border-collapse: collapse; font-size: 13px; }}
+            td, th {{ border: 1px solid #ddd; padding: 4px 8px; text-align: left; }}
         </style>
-        <script>
-        // Track visited links during session
-        const VISITED_LINKS_KEY = 'visited_links_' + location.pathname;
-        
-        function initVisitedLinks() {{
-            // Restore visited state from sessionStorage
-            const visited = JSON.parse(sessionStorage.getItem(VISITED_LINKS_KEY) || '[]');
-            document.querySelectorAll('a[data-trackable]').forEach(link => {{
-                if (visited.includes(link.href)) {{
-                    link.classList.add('visited-link');
-                }}
-                
-                // Track click
-                link.addEventListener('click', function() {{
-                    if (!visited.includes(this.href)) {{
-                        visited.push(this.href);
-                    }}
-                    this.classList.add('visited-link');
-                    sessionStorage.setItem(VISITED_LINKS_KEY, JSON.stringify(visited));
-                }});
-            }});
-        }}
-        
-        // Init when page loads
-        document.addEventListener('DOMContentLoaded', initVisitedLinks);
-        </script>
         </head><body>
-        <a href="/set_root" class="admin-btn">⚙️ Set Root</a>
-        <h2>Directory: {req}</h2>{backlink}<hr>
-
-        <h3>Upload file</h3>
-        <form id="uForm">
-            <input type="file" id="uFile" name="file" required>
-            <button type="submit">Upload</button>
+        <h2>🐞 Debug</h2>
+        <form method="POST" action="/?debug=status">
+          <label>Profiling cProfile (frazione richieste, 0 = off):</label>
+          <input name="profile_rate" value="{st['profile_rate']}"><br>
+          <label>Slow-request log (soglia ms, 0 = off):</label>
+          <input name="slow_ms" value="{st['slow_ms']}"><br><br>
+          <button type="submit">Salva</button>
         </form>
-
-        <div id="box" style="display:none;margin:20px 0;">
-            <div style="display:flex;justify-content:space-between;">
-                <span id="perc">0%</span><span id="speed">0 KB/s</span>
-            </div>
-            <div style="height:20px;background:#eee;border-radius:10px;">
-                <div id="bar" style="height:100%;width:0%;background:#4CAF50;border-radius:10px;"></div>
-            </div>
-        </div>
-
-        <script>
-        document.getElementById('uForm').addEventListener('submit', e => {{
-            e.preventDefault();
-            const f = document.getElementById('uFile').files[0];
-            if (!f) return;
-
-            const fd = new FormData();
-            fd.append('file', f);
-
-            const x = new XMLHttpRequest();
-            x.open('POST', window.location.pathname);
-
-            x.upload.onprogress = ev => {{
-                if (!ev.lengthComputable) return;
-                const p = (ev.loaded / ev.total * 100).toFixed(1);
-                const s = (ev.loaded / (ev.timeStamp / 1000) / 1024).toFixed(1);
-                document.getElementById('box').style.display = 'block';
-                document.getElementById('bar').style.width  = p + '%';
-                document.getElementById('perc').textContent = p + '%';
-                document.getElementById('speed').textContent = s + ' KB/s';
-            }};
-
-            x.onload  = () => {{ window.location.reload(); }};
-            x.onerror = () => {{ alert('Upload error'); }};
-            x.send(fd);
-        }});
-        </script>
-
-        <hr>
-        {sort_buttons}
-        <hr><h3>Contents</h3><ul>
+        <p><a href="/?debug=threads">🧵 Thread dump</a> — log: <code>{profiling.SLOW_LOG}</code></p>
+        <h3>Richieste lente</h3>
+        <table><tr><th>Quando</th><th>Richiesta</th><th>Status</th><th>ms</th><th>Fasi (ms)</th></tr>{slow}</table>
+        <h3>Profili (<code>{profiling.PROFILE_DIR}</code>)</h3><ul>{profiles}</ul>
+        <a href="/">← Back to Files</a>
+        </body></html>
         """
+        self.wfile.write(html.encode())
 
+    def _debug_post(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = parse_qs(self.rfile.read(length).decode(errors='ignore'))
         try:
-            items = os.listdir(local)
-            
-            # Sort items based on parameters
-            if sort_by == 'size':
-                # Sort by file size (with name as secondary sort), directories get size 0
-                def get_sort_key(item):
-                    path = os.path.join(local, item)
-                    try:
-                        size = os.path.getsize(path) if os.path.isfile(path) else 0
-                    except:
-                        size = 0
-                    return (size, item)
-                items = sorted(items, key=get_sort_key, reverse=(sort_dir == 'desc'))
-            elif sort_by == 'format':
-                # Sort by file extension/format
-                def get_sort_key(item):
-                    path = os.path.join(local, item)
-                    if os.path.isdir(path):
-                        ext = ''
-                    else:
-                        ext = os.path.splitext(item)[1].lower()
-                    return (ext, item)
-                items = sorted(items, key=get_sort_key, reverse=(sort_dir == 'desc'))
-            elif sort_by == 'date':
-                # Sort by modification date
-                def get_sort_key(item):
-                    path = os.path.join(local, item)
-                    try:
-                        mtime = os.path.getmtime(path)
-                    except:
-                        mtime = 0
-                    return (mtime, item)
-                items = sorted(items, key=get_sort_key, reverse=(sort_dir == 'desc'))
-            else:
-                # Sort by name (default)
-                items = sorted(items, reverse=(sort_dir == 'desc'))
-            
-            for item in items:
-                p = os.path.join(local, item)
-                nxt = (req.strip("/") + "/" + item).lstrip("/")
-                href = "/" + quote(nxt.replace("\\", "/"))
-                if os.path.isdir(p):
-                    html += f"<li>📁 <a href='{href}' data-trackable>{item}</a></li>"
-                else:
-                    icon = get_file_icon(item)
-                    size = format_size(os.path.getsize(p))
-                    ctim = get_creation_time(p)
-                    html += (f"<li>{icon} <a download href='{href}' data-trackable>{item}</a> "
-                             f"<small>({size}, {ctim})</small></li>")
-            html += "</ul></body></html>"
-        except OSError:
-            html = f"<html><body><h2>Cannot list {req}</h2></body></html>"
+            profiling.update(profile_rate=params.get('profile_rate', [None])[0],
+                             slow_ms=params.get('slow_ms', [None])[0])
+        except ValueError:
+            self._err("Valori non validi"); return
+        print(f"🐞 Debug: profile_rate={profiling.SETTINGS['profile_rate']} "
+              f"slow_ms={profiling.SETTINGS['slow_ms']}")
+        self.send_response(303)
+        self.send_header("Location", "/?debug=status")
+        self.end_headers()
 
-        self.wfile.write(html.encode())
+    def _send_text(self, text: str):
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     # ------- helper pagina errore ------------------------------------------
     def _err(self, msg:str):
@@ -0,0 +1,186 @@
+// Track visited links during session
+const VISITED_LINKS_KEY = 'visited_links_' + location.pathname;
+// Restore visited state from sessionStorage
+const visited = JSON.parse(sessionStorage.getItem(VISITED_LINKS_KEY) || '[]');
+
+function trackLink(link) {
+    if (visited.includes(link.href)) {
+        link.classList.add('visited-link');
+    }
+
+    // Track click
+    link.addEventListener('click', function() {
+        if (!visited.includes(this.href)) {
+            visited.push(this.href);
+        }
+        this.classList.add('visited-link');
+        sessionStorage.setItem(VISITED_LINKS_KEY, JSON.stringify(visited));
+    });
+}
+
+function initVisitedLinks() {
+    document.querySelectorAll('a[data-trackable]').forEach(trackLink);
+}
+
+// Init when page loads
+document.addEventListener('DOMContentLoaded', initVisitedLinks);
+
+// Aggiornamenti live: la lista viene patchata in place dagli eventi SSE
+// (add / change / remove), senza ricaricare la pagina
+const live = !!window.EventSource;
+if (live) {
+    const params = new URLSearchParams(location.search);
+    const sortBy = params.get('sort') || 'name';
+    const desc = params.get('dir') === 'desc';
+    const base = location.pathname.replace(/\/$/, '');
+    const listing = () => document.getElementById('listing');
+    // nome -> <li>, costruita una volta: niente scansioni lineari per evento
+    let byName = null;
+    const index = () => byName ||
+        (byName = new Map([...listing().children].map(li => [li.dataset.name, li])));
+    const findItem = name => index().get(name);
+
+    // Stesse chiavi di ordinamento di _list_dir lato server
+    function ext(name) {
+        // come os.path.splitext: i punti iniziali non aprono un'estensione
+        const s = name.replace(/^\.+/, ''), i = s.lastIndexOf('.');
+        return i >= 0 ? s.slice(i).toLowerCase() : '';
+    }
+
+    function sortKey(d) {
+        switch (sortBy) {
+            case 'size':   return [d.dir ? 0 : d.bytes, d.name];
+            case 'format': return [d.dir ? '' : ext(d.name), d.name];
+            case 'date':   return [d.mtime, d.name];
+            default:       return [d.name];
+        }
+    }
+
+    function compare(a, b) {
+        for (let i = 0; i < a.length; i++) {
+            if (a[i] < b[i]) return -1;
+            if (a[i] > b[i]) return 1;
+        }
+        return 0;
+    }
+
+    const itemData = li => ({
+        name: li.dataset.name, dir: li.dataset.dir === '1',
+        bytes: Number(li.dataset.size), mtime: Number(li.dataset.mtime),
+    });
+
+    function renderItem(d) {
+        const li = document.createElement('li');
+        li.dataset.name = d.name;
+        li.dataset.size = d.bytes;
+        li.dataset.mtime = d.mtime;
+        if (d.dir) li.dataset.dir = '1';
+        const a = document.createElement('a');
+        a.href = base + '/' + encodeURIComponent(d.name);
+        a.textContent = d.name;
+        a.setAttribute('data-trackable', '');
+        if (!d.dir) a.setAttribute('download', '');
+        trackLink(a);
+        li.append((d.dir ? '📁' : d.icon) + ' ', a);
+        if (!d.dir) {
+            const small = document.createElement('small');
+            small.textContent = '(' + d.size + ', ' + d.ctime + ')';
+            li.append(' ', small);
+        }
+        return li;
+    }
+
+    const unchanged = (li, d) => {
+        const o = itemData(li);
+        return o.dir === d.dir && o.bytes === d.bytes && o.mtime === d.mtime;
+    };
+
+    // primo elemento che va dopo `key` (la lista è già ordinata: ricerca binaria)
+    function nextItem(key) {
+        const kids = listing().children;
+        let lo = 0, hi = kids.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1, c = compare(sortKey(itemData(kids[mid])), key);
+            if (desc ? c > 0 : c < 0) lo = mid + 1; else hi = mid;
+        }
+        return kids[lo] || null;
+    }
+
+    function upsert(d) {
+        const old = findItem(d.name);
+        if (old) {
+            if (unchanged(old, d)) return;
+            // cambiata: size / data possono spostarla, la si reinserisce
+            old.remove();
+        }
+        const li = renderItem(d);
+        listing().insertBefore(li, nextItem(sortKey(d)));
+        index().set(d.name, li);
+    }
+
+    function remove(name) {
+        const old = findItem(name);
+        if (old) { old.remove(); index().delete(name); }
+    }
+
+    // stato completo (solo se la lista mostrata è superata): si riordina
+    // tutto in una passata, riusando i <li> invariati
+    function reconcile(items) {
+        const prev = index();
+        items.sort((a, b) => {
+            const c = compare(sortKey(a), sortKey(b));
+            return desc ? -c : c;
+        });
+        const next = new Map(), frag = document.createDocumentFragment();
+        for (const d of items) {
+            const old = prev.get(d.name);
+            const li = old && unchanged(old, d) ? old : renderItem(d);
+            next.set(d.name, li);
+            frag.appendChild(li);
+        }
+        listing().replaceChildren(frag);
+        byName = next;
+    }
+
+    // `since` è la versione della lista renderizzata: lo snapshot arriva solo
+    // se qualcosa è cambiato nel frattempo (alle riconnessioni vale il
+    // Last-Event-ID che il browser manda da solo)
+    const es = new EventSource(location.pathname + '?events=1&since=' +
+                               encodeURIComponent(listing().dataset.version || ''));
+    es.addEventListener('add', ev => upsert(JSON.parse(ev.data)));
+    es.addEventListener('change', ev => upsert(JSON.parse(ev.data)));
+    es.addEventListener('snapshot', ev => reconcile(JSON.parse(ev.data)));
+    es.addEventListener('remove', ev => remove(JSON.parse(ev.data).name));
+    es.addEventListener('reload', () => window.location.reload());
+}
+
+document.getElementById('uForm').addEventListener('submit', e => {
+    e.preventDefault();
+    const f = document.getElementById('uFile').files[0];
+    if (!f) return;
+
+    const fd = new FormData();
+    fd.append('file', f);
+
+    const x = new XMLHttpRequest();
+    x.open('POST', window.location.pathname);
+
+    x.upload.onprogress = ev => {
+        if (!ev.lengthComputable) return;
+        const p = (ev.loaded / ev.total * 100).toFixed(1);
+        const s = (ev.loaded / (ev.timeStamp / 1000) / 1024).toFixed(1);
+        document.getElementById('box').style.display = 'block';
+        document.getElementById('bar').style.width  = p + '%';
+        document.getElementById('perc').textContent = p + '%';
+        document.getElementById('speed').textContent = s + ' KB/s';
+    };
+
+    x.onload  = () => {
+        // con gli aggiornamenti live il nuovo file arriva via SSE
+        if (!live || x.status >= 400) { window.location.reload(); return; }
+        document.getElementById('box').style.display = 'none';
+        document.getElementById('uForm').reset();
+    };
+    x.onerror = () => { alert('Upload error'); };
+    x.send(fd);
+});